@@ -1,11 +1,15 @@
 import asyncio
+import gc
 import pytest
+import weakref
 
 from unittest import mock
 
 from ...askar.profile import AskarProfile
 from ...config.injection_context import InjectionContext
 from ...ledger.base import BaseLedger
+from ...storage.base import BaseStorage
+from ...wallet.base import BaseWallet
 
 from .. import profile as test_module
 
@@ -121,3 +125,34 @@ async def test_profile_manager_store():
 
         assert sessionProfile._opener == askar_profile_session
         askar_profile.store.session.assert_called_once_with(profile)
+
+
+@pytest.mark.asyncio
+async def test_session_freed_without_gc():
+    profile = await test_module.AskarProfileManager().provision(
+        InjectionContext(),
+        {
+            "name": ":memory:",
+            "key": await test_module.AskarProfileManager.generate_store_key(),
+            "key_derivation_method": "RAW",
+        },
+    )
+    gc.disable()
+    try:
+        async with profile.session() as session:
+            session.inject(BaseStorage)
+            session.inject(BaseWallet)
+        session_ref = weakref.ref(session)
+        del session
+        assert session_ref() is None
+
+        # sessions on the transport paths are awaited and never exited
+        session = await profile.session()
+        session.inject(BaseStorage)
+        session.inject(BaseWallet)
+        session_ref = weakref.ref(session)
+        del session
+        assert session_ref() is None
+    finally:
+        gc.enable()
+    await profile.close()
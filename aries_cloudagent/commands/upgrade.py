@@ -345,11 +345,11 @@ async def upgrade(
         "upgrade.upgrade_subwallets" in settings
         and len(settings.get("upgrade.upgrade_subwallets")) >= 1
     ):
-        for _wallet_id in settings.get("upgrade.upgrade_subwallets"):
-            async with root_profile.session() as session:
-                wallet_record = await WalletRecord.retrieve_by_id(
-                    session, record_id=_wallet_id
-                )
+        async with root_profile.session() as session:
+            wallet_records = await WalletRecord.retrieve_many_by_id(
+                session, settings.get("upgrade.upgrade_subwallets")
+            )
+        for wallet_record in wallet_records:
             wallet_profile = await get_wallet_profile(
                 base_context=root_profile.context, wallet_record=wallet_record
             )
@@ -97,8 +97,11 @@ class CachedProvider(BaseProvider):
         of settings.
         """
         # MTODO: how to handle changes in the config?
-        instance_vals = {key: config.get(key) for key in self._unique_settings_keys}
-        instance_key = hashlib.sha256(str(instance_vals).encode()).hexdigest()
+        if self._unique_settings_keys:
+            instance_vals = {key: config.get(key) for key in self._unique_settings_keys}
+            instance_key = hashlib.sha256(str(instance_vals).encode()).hexdigest()
+        else:
+            instance_key = None
         if not self._instances.get(instance_key):
             self._instances[instance_key] = self._provider.provide(config, injector)
 
@@ -78,6 +78,19 @@ class TestProvider(IsolatedAsyncioTestCase):
 
         assert first_instance is not second_instance
 
+    async def test_cached_provider_no_unique_settings(self):
+        cached_provider = CachedProvider(
+            ClassProvider("aries_cloudagent.config.settings.Settings")
+        )
+        context = InjectionContext()
+
+        first_instance = cached_provider.provide(Settings({}), context.injector)
+        second_instance = cached_provider.provide(
+            Settings({"wallet.name": "wallet.name"}), context.injector
+        )
+
+        assert first_instance is second_instance
+
     async def test_instance_provider_ref_gone_x(self):
         context = InjectionContext(settings=Settings({}), enforce_typing=False)
         item = X()
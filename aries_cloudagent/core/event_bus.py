@@ -122,6 +122,17 @@ class EventBus:
             except Exception:
                 LOGGER.exception("Error occurred while processing event")
 
+    def has_subscribers(self, topic: str) -> bool:
+        """Check whether any subscriber would receive an event on a topic.
+
+        Args:
+            topic (str): the event topic
+
+        """
+        return any(
+            pattern.match(topic) for pattern in self.topic_patterns_to_subscribers
+        )
+
     def subscribe(self, pattern: Pattern, processor: Callable):
         """Subscribe to an event.
 
@@ -196,6 +207,10 @@ class MockEventBus(EventBus):
         super().__init__()
         self.events: List[Tuple[Profile, Event]] = []
 
+    def has_subscribers(self, topic: str) -> bool:
+        """Report every topic as subscribed so that all events are recorded."""
+        return True
+
     async def notify(self, profile: "Profile", event: Event):
         """Append the event to MockEventBus.events."""
         self.events.append((profile, event))
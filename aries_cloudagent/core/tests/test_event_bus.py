@@ -81,6 +81,14 @@ def test_unsub_unsubbed_processor(event_bus: EventBus, processor):
     event_bus.unsubscribe(re.compile(".*"), another_processor)
 
 
+def test_has_subscribers(event_bus: EventBus, processor):
+    """Test checking for subscribers on a topic."""
+    assert not event_bus.has_subscribers("acapy::record::topic")
+    event_bus.subscribe(re.compile("^acapy::record::.*"), processor)
+    assert event_bus.has_subscribers("acapy::record::topic")
+    assert not event_bus.has_subscribers("acapy::webhook::topic")
+
+
 @pytest.mark.asyncio
 async def test_sub_notify(event_bus: EventBus, profile, event, processor):
     """Test subscriber receives event."""
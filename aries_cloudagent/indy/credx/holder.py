@@ -1,12 +1,13 @@
 """Indy holder implementation."""
 
 import asyncio
-import json
 import logging
 import re
-from typing import Dict, Optional, Sequence, Tuple, Union
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
 
-from aries_askar import AskarError, AskarErrorCode
+from aries_askar import AskarError, AskarErrorCode, Entry
+from aries_askar.store import Scan
 from indy_credx import (
     Credential,
     CredentialRequest,
@@ -18,8 +19,10 @@ from indy_credx import (
 )
 from uuid_utils import uuid4
 
+
 from ...askar.profile import AskarProfile
 from ...ledger.base import BaseLedger
+from ...utils.json_util import json_dumps, json_loads
 from ...wallet.error import WalletNotFoundError
 from ..holder import IndyHolder, IndyHolderError
 
@@ -29,6 +32,35 @@ CATEGORY_CREDENTIAL = "credential"
 CATEGORY_LINK_SECRET = "master_secret"
 
 
+# Serialized ledger objects (schemas, credential definitions, revocation
+# registry definitions), keyed on their identifier. Ledger identifiers name
+# immutable objects, so the identifier alone selects the entry. The cache holds
+# at most _JSON_CACHE_SIZE strings; a credential definition typically serializes
+# to a few KB, which keeps it within a few MB.
+_JSON_CACHE_SIZE = 512
+_json_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _cached_dumps(key: Optional[str], obj: Union[dict, str]) -> str:
+    """Serialize a ledger object, reusing an earlier result for the same identifier.
+
+    Objects which are already serialized are passed through unchanged.
+    """
+    if isinstance(obj, str):
+        return obj
+    if not key:
+        return json_dumps(obj)
+    value = _json_cache.get(key)
+    if value is not None:
+        _json_cache.move_to_end(key)
+        return value
+    value = json_dumps(obj)
+    _json_cache[key] = value
+    if len(_json_cache) > _JSON_CACHE_SIZE:
+        _json_cache.popitem(last=False)
+    return value
+
+
 def _make_cred_info(cred_id, cred: Credential):
     cred_info = cred.to_dict()  # not secure!
     rev_info = cred_info["signature"]["r_credential"]
@@ -42,6 +74,75 @@ def _make_cred_info(cred_id, cred: Credential):
     }
 
 
+def _load_cred_infos(rows: Sequence[Entry]) -> List[dict]:
+    return [_make_cred_info(row.name, Credential.load(row.raw_value)) for row in rows]
+
+
+async def _scan_cred_infos(rows: Scan) -> List[dict]:
+    # decode each chunk in the executor while the scan fetches the next one;
+    # chunks start small and grow, so short scans begin decoding early and
+    # long scans are handed over in fewer, larger batches
+    loop = asyncio.get_event_loop()
+    pending = []
+    batch = []
+    chunk = IndyHolder.CHUNK
+    async for row in rows:
+        batch.append(row)
+        if len(batch) == chunk:
+            pending.append(loop.run_in_executor(None, _load_cred_infos, batch))
+            batch = []
+            chunk = min(chunk * 2, IndyHolder.CHUNK_MAX)
+    if batch:
+        pending.append(loop.run_in_executor(None, _load_cred_infos, batch))
+    return [info for infos in await asyncio.gather(*pending) for info in infos]
+
+
+def _merge_referent_rows(
+    creds: dict,
+    rows: Sequence[Entry],
+    reft: str,
+    cred_infos: Dict[str, dict],
+    interval: Optional[dict],
+):
+    for row in rows:
+        cred = creds.get(row.name)
+        if cred is None:
+            creds[row.name] = {
+                "cred_info": cred_infos[row.name],
+                "interval": interval,
+                "presentation_referents": [reft],
+            }
+        elif reft not in cred["presentation_referents"]:
+            cred["presentation_referents"].append(reft)
+
+
+def _match_tag_filter(tag_filter: dict, tags: dict) -> bool:
+    # evaluate a WQL tag filter against the tags of a single entry; operators
+    # without an exact local equivalent raise ValueError so the caller can
+    # defer to the storage search instead
+    for key, value in tag_filter.items():
+        if key == "$and":
+            matched = all(_match_tag_filter(sub, tags) for sub in value)
+        elif key == "$or":
+            matched = any(_match_tag_filter(sub, tags) for sub in value)
+        elif key == "$not":
+            matched = not _match_tag_filter(value, tags)
+        elif key == "$exist":
+            names = [value] if isinstance(value, str) else value
+            matched = all(name in tags for name in names)
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported tag filter operator: {key}")
+        elif isinstance(value, str):
+            matched = tags.get(key) == value
+        elif isinstance(value, dict) and value.keys() == {"$in"}:
+            matched = tags.get(key) in value["$in"]
+        else:
+            raise ValueError(f"Unsupported tag filter value for {key}: {value}")
+        if not matched:
+            return False
+    return True
+
+
 def _normalize_attr_name(name: str) -> str:
     return name.replace(" ", "")
 
@@ -50,6 +151,8 @@ class IndyCredxHolder(IndyHolder):
     """Indy-credx holder class."""
 
     LINK_SECRET_ID = "default"
+    PRES_REQ_CRED_ID_PREFIX = "cred_id:"
+    MAX_CONCURRENT_SEARCHES = 8
 
     def __init__(self, profile: AskarProfile):
         """Initialize an IndyCredxHolder instance.
@@ -136,12 +239,13 @@ class IndyCredxHolder(IndyHolder):
             cred_req_metadata.to_json(),
         )
 
-        LOGGER.debug(
-            "Created credential request. "
-            "credential_request_json=%s credential_request_metadata_json=%s",
-            cred_req_json,
-            cred_req_metadata_json,
-        )
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug(
+                "Created credential request. "
+                "credential_request_json=%s credential_request_metadata_json=%s",
+                cred_req_json,
+                cred_req_metadata_json,
+            )
 
         return cred_req_json, cred_req_metadata_json
 
@@ -178,8 +282,8 @@ class IndyCredxHolder(IndyHolder):
                 cred.process,
                 credential_request_metadata,
                 secret,
-                credential_definition,
-                rev_reg_def,
+                _cached_dumps(credential_definition.get("id"), credential_definition),
+                rev_reg_def and _cached_dumps(rev_reg_def.get("id"), rev_reg_def),
             )
         except CredxError as err:
             raise IndyHolderError("Error processing received credential") from err
@@ -208,13 +312,18 @@ class IndyCredxHolder(IndyHolder):
 
         # FIXME - sdk has some special handling for fully qualified DIDs here
 
-        mime_types = {}
         for k, attr_value in credential_data["values"].items():
             attr_name = _normalize_attr_name(k)
             # tags[f"attr::{attr_name}::marker"] = "1"
             tags[f"attr::{attr_name}::value"] = attr_value["raw"]
-            if credential_attr_mime_types and k in credential_attr_mime_types:
-                mime_types[k] = credential_attr_mime_types[k]
+
+        mime_types = {}
+        if credential_attr_mime_types:
+            mime_types = {
+                k: credential_attr_mime_types[k]
+                for k in credential_data["values"].keys()
+                & credential_attr_mime_types.keys()
+            }
 
         try:
             async with self._profile.transaction() as txn:
@@ -246,19 +355,15 @@ class IndyCredxHolder(IndyHolder):
 
         """
 
-        result = []
-
         try:
             rows = self._profile.store.scan(
                 CATEGORY_CREDENTIAL,
-                wql,
+                json_dumps(wql) if wql else wql,
                 start,
                 count,
                 self._profile.settings.get("wallet.askar_profile"),
             )
-            async for row in rows:
-                cred = Credential.load(row.raw_value)
-                result.append(_make_cred_info(row.name, cred))
+            result = await _scan_cred_infos(rows)
         except AskarError as err:
             raise IndyHolderError("Error retrieving credentials") from err
         except CredxError as err:
@@ -283,6 +388,11 @@ class IndyCredxHolder(IndyHolder):
             count: Maximum number of records to return
             extra_query: wql query dict
 
+        A presentation request named "cred_id:<credential id>" names the credential
+        expected to satisfy it; that credential is looked up directly and the
+        wallet search is skipped for the referents whose full tag filter,
+        restrictions and extra query included, it is found to satisfy.
+
         """
         extra_query = extra_query or {}
         if not referents:
@@ -291,8 +401,7 @@ class IndyCredxHolder(IndyHolder):
                 *presentation_request["requested_predicates"],
             )
 
-        creds = {}
-
+        tag_filters = []
         for reft in referents:
             names = set()
             if reft in presentation_request["requested_attributes"]:
@@ -319,32 +428,84 @@ class IndyCredxHolder(IndyHolder):
                 tag_filter = {"$and": [tag_filter] + restr}
             if extra_query:
                 tag_filter = {"$and": [tag_filter, extra_query]}
+            tag_filters.append((reft, tag_filter))
 
-            rows = self._profile.store.scan(
-                CATEGORY_CREDENTIAL,
-                tag_filter,
-                start,
-                count,
-                self._profile.settings.get("wallet.askar_profile"),
-            )
-            async for row in rows:
-                if row.name in creds:
-                    creds[row.name]["presentation_referents"].add(reft)
-                else:
-                    cred_info = _make_cred_info(
-                        row.name, Credential.load(row.raw_value)
-                    )
-                    creds[row.name] = {
+        creds = {}
+        named = await self._get_named_cred_info(presentation_request)
+        if named:
+            cred_info, cred_tags = named
+            pres_refts = []
+            for reft, tag_filter in tag_filters:
+                try:
+                    if _match_tag_filter(tag_filter, cred_tags):
+                        pres_refts.append(reft)
+                except ValueError:
+                    pass
+            if pres_refts:
+                tag_filters = [f for f in tag_filters if f[0] not in pres_refts]
+                if not start:
+                    creds[cred_info["referent"]] = {
                         "cred_info": cred_info,
                         "interval": presentation_request.get("non_revoked"),
-                        "presentation_referents": {reft},
+                        "presentation_referents": pres_refts,
                     }
 
-        for cred in creds.values():
-            cred["presentation_referents"] = list(cred["presentation_referents"])
+        # run the per-referent searches concurrently, bounded so a large
+        # request does not claim every connection in the store pool
+        limit = asyncio.Semaphore(IndyCredxHolder.MAX_CONCURRENT_SEARCHES)
+
+        async def fetch(tag_filter: dict) -> list:
+            async with limit:
+                rows = self._profile.store.scan(
+                    CATEGORY_CREDENTIAL,
+                    json_dumps(tag_filter),
+                    start,
+                    count,
+                    self._profile.settings.get("wallet.askar_profile"),
+                )
+                return [row async for row in rows]
+
+        results = await asyncio.gather(
+            *(fetch(tag_filter) for (_, tag_filter) in tag_filters)
+        )
+
+        new_rows = {}
+        for rows in results:
+            for row in rows:
+                if row.name not in creds and row.name not in new_rows:
+                    new_rows[row.name] = row
+        cred_infos = await asyncio.get_event_loop().run_in_executor(
+            None, _load_cred_infos, list(new_rows.values())
+        )
+        cred_infos = {cred_info["referent"]: cred_info for cred_info in cred_infos}
+
+        interval = presentation_request.get("non_revoked")
+        for (reft, _), rows in zip(tag_filters, results):
+            _merge_referent_rows(creds, rows, reft, cred_infos, interval)
 
         return list(creds.values())
 
+    async def _get_named_cred_info(
+        self, presentation_request: dict
+    ) -> Optional[Tuple[dict, dict]]:
+        """Fetch the credential info and tags named by a presentation request."""
+        name = presentation_request.get("name") or ""
+        if not name.startswith(IndyCredxHolder.PRES_REQ_CRED_ID_PREFIX):
+            return None
+        cred_id = name[len(IndyCredxHolder.PRES_REQ_CRED_ID_PREFIX) :]
+        try:
+            async with self._profile.session() as session:
+                entry = await session.handle.fetch(CATEGORY_CREDENTIAL, cred_id)
+        except AskarError as err:
+            raise IndyHolderError("Error retrieving credential") from err
+        if not entry:
+            return None
+        try:
+            cred = Credential.load(entry.raw_value)
+        except CredxError as err:
+            raise IndyHolderError("Error loading requested credential") from err
+        return _make_cred_info(cred_id, cred), entry.tags
+
     async def get_credential(self, credential_id: str) -> str:
         """Get a credential stored in the wallet.
 
@@ -353,7 +514,7 @@ class IndyCredxHolder(IndyHolder):
 
         """
         cred = await self._get_credential(credential_id)
-        return json.dumps(_make_cred_info(credential_id, cred))
+        return json_dumps(_make_cred_info(credential_id, cred))
 
     async def _get_credential(self, credential_id: str) -> Credential:
         """Get an unencoded Credential instance from the store."""
@@ -373,6 +534,48 @@ class IndyCredxHolder(IndyHolder):
         except CredxError as err:
             raise IndyHolderError("Error loading requested credential") from err
 
+    async def get_credentials_by_ids(
+        self, credential_ids: Sequence[str]
+    ) -> Dict[str, dict]:
+        """Get several credentials stored in the wallet.
+
+        Args:
+            credential_ids: Credential ids to retrieve
+
+        Returns:
+            A dict mapping credential ids to credential info, omitting ids that
+            are not found in the wallet
+
+        """
+        creds = await self._get_credentials(credential_ids)
+        return {
+            cred_id: _make_cred_info(cred_id, cred) for (cred_id, cred) in creds.items()
+        }
+
+    async def _get_credentials(
+        self, credential_ids: Sequence[str]
+    ) -> Dict[str, Credential]:
+        """Get unencoded Credential instances from the store in a single session."""
+        entries = {}
+        try:
+            async with self._profile.session() as session:
+                for cred_id in credential_ids:
+                    if cred_id not in entries:
+                        entries[cred_id] = await session.handle.fetch(
+                            CATEGORY_CREDENTIAL, cred_id
+                        )
+        except AskarError as err:
+            raise IndyHolderError("Error retrieving credentials") from err
+
+        try:
+            return {
+                cred_id: Credential.load(entry.raw_value)
+                for (cred_id, entry) in entries.items()
+                if entry
+            }
+        except CredxError as err:
+            raise IndyHolderError("Error loading requested credential") from err
+
     async def credential_revoked(
         self, ledger: BaseLedger, credential_id: str, fro: int = None, to: int = None
     ) -> bool:
@@ -403,17 +606,21 @@ class IndyCredxHolder(IndyHolder):
             credential_id: Credential id to remove
 
         """
-        try:
-            async with self._profile.session() as session:
-                await session.handle.remove(CATEGORY_CREDENTIAL, credential_id)
-                await session.handle.remove(
-                    IndyHolder.RECORD_TYPE_MIME_TYPES, credential_id
-                )
-        except AskarError as err:
-            if err.code == AskarErrorCode.NOT_FOUND:
-                pass
-            else:
-                raise IndyHolderError("Error deleting credential") from err
+
+        async def remove(category: str):
+            try:
+                async with self._profile.session() as session:
+                    await session.handle.remove(category, credential_id)
+            except AskarError as err:
+                if err.code == AskarErrorCode.NOT_FOUND:
+                    pass
+                else:
+                    raise IndyHolderError("Error deleting credential") from err
+
+        # the credential and its MIME types record are independent entries
+        await asyncio.gather(
+            remove(CATEGORY_CREDENTIAL), remove(IndyHolder.RECORD_TYPE_MIME_TYPES)
+        )
 
     async def get_mime_type(
         self, credential_id: str, attr: str = None
@@ -436,7 +643,7 @@ class IndyCredxHolder(IndyHolder):
                 )
         except AskarError as err:
             raise IndyHolderError("Error retrieving credential mime types") from err
-        values = mime_types_record and mime_types_record.value_json
+        values = mime_types_record and json_loads(mime_types_record.value)
         if values:
             return values.get(attr) if attr else values
 
@@ -444,8 +651,8 @@ class IndyCredxHolder(IndyHolder):
         self,
         presentation_request: dict,
         requested_credentials: dict,
-        schemas: dict,
-        credential_definitions: dict,
+        schemas: Mapping[str, Union[dict, str]],
+        credential_definitions: Mapping[str, Union[dict, str]],
         rev_states: dict = None,
     ) -> str:
         """Get credentials stored in the wallet.
@@ -453,13 +660,28 @@ class IndyCredxHolder(IndyHolder):
         Args:
             presentation_request: Valid indy format presentation request
             requested_credentials: Indy format requested credentials
-            schemas: Indy formatted schemas JSON
-            credential_definitions: Indy formatted credential definitions JSON
+            schemas: Indy formatted schemas JSON, by schema id; each schema may be
+                given as a dict or as its JSON string
+            credential_definitions: Indy formatted credential definitions JSON,
+                by credential definition id; each may be given as a dict or as its
+                JSON string
             rev_states: Indy format revocation states JSON
 
         """
 
-        creds: Dict[str, Credential] = {}
+        self_attest = requested_credentials.get("self_attested_attributes") or {}
+        req_attrs = requested_credentials.get("requested_attributes") or {}
+        req_preds = requested_credentials.get("requested_predicates") or {}
+
+        cred_ids = [
+            detail["cred_id"] for detail in (*req_attrs.values(), *req_preds.values())
+        ]
+        creds = await self._get_credentials(cred_ids)
+        for cred_id in cred_ids:
+            if cred_id not in creds:
+                raise WalletNotFoundError(
+                    f"Credential {cred_id} not found in wallet {self.profile.name}"
+                )
 
         def get_rev_state(cred_id: str, detail: dict):
             cred = creds[cred_id]
@@ -480,14 +702,9 @@ class IndyCredxHolder(IndyHolder):
                     )
             return timestamp, rev_state
 
-        self_attest = requested_credentials.get("self_attested_attributes") or {}
         present_creds = PresentCredentials()
-        req_attrs = requested_credentials.get("requested_attributes") or {}
         for reft, detail in req_attrs.items():
             cred_id = detail["cred_id"]
-            if cred_id not in creds:
-                # NOTE: could be optimized if multiple creds are requested
-                creds[cred_id] = await self._get_credential(cred_id)
             timestamp, rev_state = get_rev_state(cred_id, detail)
             present_creds.add_attributes(
                 creds[cred_id],
@@ -496,12 +713,8 @@ class IndyCredxHolder(IndyHolder):
                 timestamp=timestamp,
                 rev_state=rev_state,
             )
-        req_preds = requested_credentials.get("requested_predicates") or {}
         for reft, detail in req_preds.items():
             cred_id = detail["cred_id"]
-            if cred_id not in creds:
-                # NOTE: could be optimized if multiple creds are requested
-                creds[cred_id] = await self._get_credential(cred_id)
             timestamp, rev_state = get_rev_state(cred_id, detail)
             present_creds.add_predicates(
                 creds[cred_id],
@@ -519,8 +732,11 @@ class IndyCredxHolder(IndyHolder):
                 present_creds,
                 self_attest,
                 secret,
-                schemas.values(),
-                credential_definitions.values(),
+                [_cached_dumps(s_id, s) for (s_id, s) in schemas.items()],
+                [
+                    _cached_dumps(cd_id, cd)
+                    for (cd_id, cd) in credential_definitions.items()
+                ],
             )
         except CredxError as err:
             raise IndyHolderError("Error creating presentation") from err
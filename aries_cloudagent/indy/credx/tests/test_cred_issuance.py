@@ -12,6 +12,7 @@ from ....ledger.multiple_ledger.ledger_requests_executor import (
     IndyLedgerRequestsExecutor,
 )
 
+from ...holder import IndyHolderError
 from .. import issuer, holder, verifier
 
 
@@ -45,6 +46,8 @@ PRES_REQ_REV = {
 @pytest.mark.indy_credx
 class TestIndyCredxIssuance(IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
+        # each test creates new key material under the same identifiers
+        holder._json_cache.clear()
         context = InjectionContext(enforce_typing=False)
         mock_ledger = mock.MagicMock(
             get_credential_definition=mock.CoroutineMock(return_value={"value": {}}),
@@ -150,9 +153,18 @@ class TestIndyCredxIssuance(IsolatedAsyncioTestCase):
 
         assert not await self.holder.get_mime_type(cred_id, "name")
 
+        assert await self.holder.get_credentials_by_ids([cred_id, "missing"]) == {
+            cred_id: stored_cred
+        }
+
         creds = await self.holder.get_credentials(None, None, None)
         assert len(creds) == 1
         assert creds[0] == stored_cred
+        assert not await self.holder.get_credentials(
+            None, None, {"attr::name::value": str(2**80)}
+        )
+        with self.assertRaises(IndyHolderError):
+            await self.holder.get_credentials(None, None, {"cred_def_id": 2**80})
 
         assert not await self.holder.credential_revoked(self.ledger, cred_id)
 
@@ -173,6 +185,36 @@ class TestIndyCredxIssuance(IsolatedAsyncioTestCase):
             }
         ]
 
+        named_req = {**PRES_REQ_NON_REV, "name": f"cred_id:{cred_id}"}
+        with mock.patch.object(
+            self.holder._profile.store, "scan", mock.MagicMock()
+        ) as mock_scan:
+            search = self.holder.get_credentials_for_presentation_request_by_referent
+            named_creds = await search(named_req, None, 0, 10, {})
+            mock_scan.assert_not_called()
+        assert named_creds == pres_creds
+
+        other_cd_id = f"{TEST_DID}:3:CL:{SCHEMA_TXN}:other"
+        restricted_req = {
+            **named_req,
+            "requested_attributes": {
+                CRED_REFT: {
+                    "names": ["name", "moniker"],
+                    "restrictions": [{"cred_def_id": other_cd_id}],
+                }
+            },
+        }
+        assert not await search(restricted_req, None, 0, 10, {})
+        assert not await search(named_req, None, 0, 10, {"cred_def_id": other_cd_id})
+        restricted_req["requested_attributes"][CRED_REFT]["restrictions"] = [
+            {"cred_def_id": {"$in": [other_cd_id, cd_id]}}
+        ]
+        with mock.patch.object(
+            self.holder._profile.store, "scan", mock.MagicMock()
+        ) as mock_scan:
+            assert await search(restricted_req, None, 0, 10, {}) == pres_creds
+            mock_scan.assert_not_called()
+
         pres_json = await self.holder.create_presentation(
             PRES_REQ_NON_REV,
             {
@@ -180,7 +222,7 @@ class TestIndyCredxIssuance(IsolatedAsyncioTestCase):
                     CRED_REFT: {"cred_id": cred_id, "revealed": True}
                 }
             },
-            {s_id: schema},
+            {s_id: json.dumps(schema)},
             {cd_id: cred_def},
             rev_states=None,
         )
@@ -263,6 +305,7 @@ class TestIndyCredxIssuance(IsolatedAsyncioTestCase):
                 cred_def,
                 cred_data,
                 cred_req_meta,
+                {"name": "text/plain", "photo": "image/png"},
                 rev_reg_def=reg_def,
             )
 
@@ -270,6 +313,9 @@ class TestIndyCredxIssuance(IsolatedAsyncioTestCase):
             assert found
             stored_cred = json.loads(found)
 
+            assert await self.holder.get_mime_type(cred_id) == {"name": "text/plain"}
+            assert await self.holder.get_mime_type(cred_id, "name") == "text/plain"
+
             creds = await self.holder.get_credentials(None, None, None)
             assert len(creds) == 1
             assert creds[0] == stored_cred
@@ -338,3 +384,17 @@ class TestIndyCredxIssuance(IsolatedAsyncioTestCase):
         )
 
         await self.holder.delete_credential(cred_id)
+
+    async def test_cached_dumps(self):
+        cred_def = {"id": CRED_DEF_ID, "value": {"primary": {"n": "1"}}}
+        cached = holder._cached_dumps(CRED_DEF_ID, cred_def)
+        assert json.loads(cached) == cred_def
+        assert holder._cached_dumps(CRED_DEF_ID, dict(cred_def)) is cached
+        assert holder._cached_dumps(CRED_DEF_ID, cached) is cached
+        assert json.loads(holder._cached_dumps(None, cred_def)) == cred_def
+
+        with mock.patch.object(holder, "_JSON_CACHE_SIZE", 2):
+            holder._cached_dumps(SCHEMA_ID, {"id": SCHEMA_ID})
+            holder._cached_dumps(CRED_DEF_ID, cred_def)
+            holder._cached_dumps(REV_REG_ID, {"id": REV_REG_ID})
+        assert list(holder._json_cache) == [CRED_DEF_ID, REV_REG_ID]
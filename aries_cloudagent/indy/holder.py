@@ -1,7 +1,7 @@
 """Base Indy Holder class."""
 
 from abc import ABC, ABCMeta, abstractmethod
-from typing import Tuple, Union
+from typing import Mapping, Tuple, Union
 
 from ..core.error import BaseError
 from ..ledger.base import BaseLedger
@@ -16,6 +16,7 @@ class IndyHolder(ABC, metaclass=ABCMeta):
 
     RECORD_TYPE_MIME_TYPES = "attribute-mime-types"
     CHUNK = 256
+    CHUNK_MAX = 4096
 
     def __repr__(self) -> str:
         """Return a human readable representation of this class.
@@ -75,8 +76,8 @@ class IndyHolder(ABC, metaclass=ABCMeta):
         self,
         presentation_request: dict,
         requested_credentials: dict,
-        schemas: dict,
-        credential_definitions: dict,
+        schemas: Mapping[str, Union[dict, str]],
+        credential_definitions: Mapping[str, Union[dict, str]],
         rev_states: dict = None,
     ) -> str:
         """Get credentials stored in the wallet.
@@ -84,8 +85,11 @@ class IndyHolder(ABC, metaclass=ABCMeta):
         Args:
             presentation_request: Valid indy format presentation request
             requested_credentials: Indy format requested credentials
-            schemas: Indy formatted schemas JSON
-            credential_definitions: Indy formatted credential definitions JSON
+            schemas: Indy formatted schemas JSON, by schema id; each schema may be
+                given as a dict or as its JSON string
+            credential_definitions: Indy formatted credential definitions JSON,
+                by credential definition id; each may be given as a dict or as its
+                JSON string
             rev_states: Indy format revocation states JSON
         """
 
@@ -1,19 +1,33 @@
 """Classes for BaseStorage-based record management."""
 
-import json
+import asyncio
 import logging
 import sys
 from datetime import datetime
-from typing import Any, Mapping, Optional, Sequence, Type, TypeVar, Union
+from operator import attrgetter
+from typing import (
+    Any,
+    Callable,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from marshmallow import fields
 from uuid_utils import uuid4
 
+
 from ...cache.base import BaseCache
 from ...config.settings import BaseSettings
+from ...core.event_bus import EventBus
 from ...core.profile import ProfileSession
 from ...storage.base import BaseStorage, StorageDuplicateError, StorageNotFoundError
 from ...storage.record import StorageRecord
+from ...utils.json_util import json_dumps, json_loads
 from ..util import datetime_to_str, time_now
 from ..valid import INDY_ISO8601_DATETIME_EXAMPLE, INDY_ISO8601_DATETIME_VALIDATE
 from .base import BaseModel, BaseModelError, BaseModelSchema
@@ -24,6 +38,58 @@ LOGGER = logging.getLogger(__name__)
 RecordType = TypeVar("RecordType", bound="BaseRecord")
 
 
+def _alt_choices(alts: Any) -> Any:
+    """Upgrade a sequence of alternative values to a set for fast membership."""
+    if isinstance(alts, (list, tuple, set)):
+        try:
+            return frozenset(alts)
+        except TypeError:
+            pass  # unhashable alternatives, keep the original container
+    return alts
+
+
+def _compile_post_filter(
+    post_filter: Optional[dict],
+    positive: bool = True,
+    alt: bool = False,
+) -> Optional[Callable[[dict], bool]]:
+    """Compile a post-filter into a predicate on record values.
+
+    Returns None for an empty filter, which matches everything. See
+    `match_post_filter` for the meaning of the arguments.
+    """
+    if not post_filter:
+        return None
+
+    if alt:
+        choices = [(k, _alt_choices(alts)) for k, alts in post_filter.items()]
+
+        def match_alt(record: dict) -> bool:
+            for k, alts in choices:
+                value = record.get(k)
+                if not value:
+                    return False
+                try:
+                    hit = value in alts
+                except TypeError:
+                    hit = False  # unhashable value, cannot be in a set of choices
+                if hit != positive:
+                    return False
+            return True
+
+        return match_alt
+
+    expected = tuple(post_filter.items())
+
+    def match(record: dict) -> bool:
+        for k, v in expected:
+            if record.get(k) != v:
+                return not positive
+        return positive
+
+    return match
+
+
 def match_post_filter(
     record: dict,
     post_filter: dict,
@@ -39,29 +105,48 @@ def match_post_filter(
         alt: set to match any (positive=True) value or miss all (positive=False)
             values in post_filter
     """
-    if not post_filter:
-        return True
+    predicate = _compile_post_filter(post_filter, positive, alt)
+    return predicate is None or predicate(record)
+
+
+def _decode_and_filter(
+    rows: Sequence[StorageRecord],
+    match_positive: Optional[Callable[[dict], bool]],
+    match_negative: Optional[Callable[[dict], bool]],
+) -> list:
+    """Decode stored record values, keeping (id, value) pairs that pass filters."""
+    matched = []
+    for record in rows:
+        vals = json_loads(record.value)
+        if (match_positive is None or match_positive(vals)) and (
+            match_negative is None or match_negative(vals)
+        ):
+            matched.append((record.id, vals))
+    return matched
 
-    if alt:
-        return (
-            positive
-            and all(
-                record.get(k) and record.get(k) in alts
-                for k, alts in post_filter.items()
-            )
-        ) or (
-            (not positive)
-            and all(
-                record.get(k) and record.get(k) not in alts
-                for k, alts in post_filter.items()
-            )
-        )
 
-    for k, v in post_filter.items():
-        if record.get(k) != v:
-            return not positive
+def _tag_getter(props: Tuple[str, ...]) -> Callable[[Any], tuple]:
+    """Build a callable fetching the tagged properties of a record as a tuple."""
+    if len(props) > 1:
+        return attrgetter(*props)
 
-    return positive
+    def get(record) -> tuple:
+        return tuple(getattr(record, prop) for prop in props)
+
+    return get
+
+
+def _prefix_tag_filter(tag_filter: dict, tag_map: Mapping[str, str]) -> dict:
+    """Rename the tags used in a tag filter, recursing into its clauses."""
+    ret = {}
+    for k, v in tag_filter.items():
+        if k in ("$or", "$and") and isinstance(v, list):
+            ret[k] = [_prefix_tag_filter(clause, tag_map) for clause in v]
+        elif k == "$not" and isinstance(v, dict):
+            ret[k] = _prefix_tag_filter(v, tag_map)
+        else:
+            ret[tag_map.get(k, k)] = v
+    return ret
 
 
 class BaseRecord(BaseModel):
@@ -78,6 +163,7 @@ class BaseRecord(BaseModel):
     LOG_STATE_FLAG = None
     TAG_NAMES = {"state"}
     STATE_DELETED = "deleted"
+    QUERY_BATCH_SIZE = 128
 
     def __init__(
         self,
@@ -121,14 +207,27 @@ class BaseRecord(BaseModel):
     def get_tag_map(cls) -> Mapping[str, str]:
         """Accessor for the set of defined tags."""
 
-        return {tag.lstrip("~"): tag for tag in cls.TAG_NAMES or ()}
+        return cls._get_tag_accessors()[0]
+
+    @classmethod
+    def _get_tag_accessors(cls) -> Tuple[Mapping[str, str], Tuple[str, ...], Callable]:
+        # built once per class, and again only if TAG_NAMES is reassigned
+        cached = cls.__dict__.get("_tag_map")
+        if cached and cached[0] is cls.TAG_NAMES:
+            return cached[1]
+        tag_map = {tag.lstrip("~"): tag for tag in cls.TAG_NAMES or ()}
+        accessors = (tag_map, tuple(tag_map.values()), _tag_getter(tuple(tag_map)))
+        cls._tag_map = (cls.TAG_NAMES, accessors)
+        return accessors
 
     @property
     def storage_record(self) -> StorageRecord:
         """Accessor for a `StorageRecord` representing this record."""
 
+        tags = self.tags
+        # NaN and infinite floats in the value are stored as null
         return StorageRecord(
-            self.RECORD_TYPE, json.dumps(self.value), self.tags, self._id
+            self.RECORD_TYPE, json_dumps(self._value_for_tags(tags)), tags, self._id
         )
 
     @property
@@ -141,27 +240,32 @@ class BaseRecord(BaseModel):
     def value(self) -> dict:
         """Accessor for the JSON record value generated for this record."""
 
-        ret = self.strip_tag_prefix(self.tags)
-        ret.update({"created_at": self.created_at, "updated_at": self.updated_at})
-        ret.update(self.record_value)
-        return ret
+        return self._value_for_tags(self.tags)
+
+    def _value_for_tags(self, tags: dict) -> dict:
+        """Build the JSON record value from already generated record tags."""
+
+        return {
+            **self.strip_tag_prefix(tags),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            **self.record_value,
+        }
 
     @property
     def record_tags(self) -> dict:
         """Accessor to define implementation-specific tags."""
 
+        _, tags, getter = self._get_tag_accessors()
         return {
-            tag: getattr(self, prop)
-            for (prop, tag) in self.get_tag_map().items()
-            if getattr(self, prop) is not None
+            tag: value for tag, value in zip(tags, getter(self)) if value is not None
         }
 
     @property
     def tags(self) -> dict:
         """Accessor for the record tags generated for this record."""
 
-        tags = self.record_tags
-        return tags
+        return self.record_tags
 
     @classmethod
     async def get_cached_key(cls, session: ProfileSession, cache_key: str):
@@ -230,9 +334,37 @@ class BaseRecord(BaseModel):
         result = await storage.get_record(
             cls.RECORD_TYPE, record_id, {"forUpdate": for_update, "retrieveTags": False}
         )
-        vals = json.loads(result.value)
+        vals = json_loads(result.value)
         return cls.from_storage(record_id, vals)
 
+    @classmethod
+    async def retrieve_many_by_id(
+        cls: Type[RecordType],
+        session: ProfileSession,
+        record_ids: Sequence[str],
+        *,
+        for_update=False,
+    ) -> Sequence[RecordType]:
+        """Retrieve several stored records by ID, in the order given.
+
+        Args:
+            session: The profile session to use
+            record_ids: The IDs of the records to find
+        """
+
+        storage = session.inject(BaseStorage)
+        options = {"forUpdate": for_update, "retrieveTags": False}
+        results = await asyncio.gather(
+            *(
+                storage.get_record(cls.RECORD_TYPE, record_id, options)
+                for record_id in record_ids
+            )
+        )
+        return [
+            cls.from_storage(record_id, json_loads(result.value))
+            for record_id, result in zip(record_ids, results)
+        ]
+
     @classmethod
     async def retrieve_by_tag_filter(
         cls: Type[RecordType],
@@ -252,15 +384,19 @@ class BaseRecord(BaseModel):
         """
 
         storage = session.inject(BaseStorage)
+        search_filter, residual_filter = cls.push_down_post_filter(
+            tag_filter, post_filter, alt=False
+        )
         rows = await storage.find_all_records(
             cls.RECORD_TYPE,
-            cls.prefix_tag_filter(tag_filter),
+            cls.prefix_tag_filter(search_filter),
             options={"forUpdate": for_update, "retrieveTags": False},
         )
+        match = _compile_post_filter(residual_filter, alt=False)
         found = None
         for record in rows:
-            vals = json.loads(record.value)
-            if match_post_filter(vals, post_filter, alt=False):
+            vals = json_loads(record.value)
+            if match is None or match(vals):
                 if found:
                     raise StorageDuplicateError(
                         "Multiple {} records located for {}{}".format(
@@ -300,29 +436,40 @@ class BaseRecord(BaseModel):
         """
 
         storage = session.inject(BaseStorage)
+        tag_filter, post_filter_positive = cls.push_down_post_filter(
+            tag_filter, post_filter_positive, alt=alt
+        )
         rows = await storage.find_all_records(
             cls.RECORD_TYPE,
             cls.prefix_tag_filter(tag_filter),
             options={"retrieveTags": False},
         )
+        filters = (
+            _compile_post_filter(post_filter_positive, positive=True, alt=alt),
+            _compile_post_filter(post_filter_negative, positive=False, alt=alt),
+        )
+        batch_size = cls.QUERY_BATCH_SIZE
+        if len(rows) > batch_size:
+            # decode larger result sets in batches off the event loop
+            loop = asyncio.get_event_loop()
+            batches = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        None, _decode_and_filter, rows[i : i + batch_size], *filters
+                    )
+                    for i in range(0, len(rows), batch_size)
+                )
+            )
+        else:
+            batches = [_decode_and_filter(rows, *filters)]
+
         result = []
-        for record in rows:
-            vals = json.loads(record.value)
-            if match_post_filter(
-                vals,
-                post_filter_positive,
-                positive=True,
-                alt=alt,
-            ) and match_post_filter(
-                vals,
-                post_filter_negative,
-                positive=False,
-                alt=alt,
-            ):
+        for batch in batches:
+            for record_id, vals in batch:
                 try:
-                    result.append(cls.from_storage(record.id, vals))
+                    result.append(cls.from_storage(record_id, vals))
                 except BaseModelError as err:
-                    raise BaseModelError(f"{err}, for record id {record.id}")
+                    raise BaseModelError(f"{err}, for record id {record_id}")
         return result
 
     async def save(
@@ -345,6 +492,7 @@ class BaseRecord(BaseModel):
         """
 
         new_record = None
+        serialized = None
         log_reason = reason or ("Updated record" if self._id else "Created record")
         try:
             self.updated_at = time_now()
@@ -361,16 +509,20 @@ class BaseRecord(BaseModel):
                 new_record = True
                 self._new_with_id = False
         finally:
-            params = {self.RECORD_TYPE: self.serialize()}
-            if log_params:
-                params.update(log_params)
-            if new_record is None:
-                log_reason = f"FAILED: {log_reason}"
-            self.log_state(
-                log_reason, params, override=log_override, settings=session.settings
-            )
+            if self.log_state_enabled(session.settings, log_override):
+                serialized = self.serialize()
+                params = {self.RECORD_TYPE: serialized}
+                if log_params:
+                    params.update(log_params)
+                if new_record is None:
+                    log_reason = f"FAILED: {log_reason}"
+                self.log_state(
+                    log_reason, params, override=log_override, settings=session.settings
+                )
 
-        await self.post_save(session, new_record, self._last_state, event)
+        await self.post_save(
+            session, new_record, self._last_state, event, serialized=serialized
+        )
         self._last_state = self.state
 
         return self._id
@@ -381,6 +533,8 @@ class BaseRecord(BaseModel):
         new_record: bool,
         last_state: Optional[str],
         event: bool = None,
+        *,
+        serialized: Optional[dict] = None,
     ):
         """Perform post-save actions.
 
@@ -389,12 +543,13 @@ class BaseRecord(BaseModel):
             new_record: Flag indicating if the record was just created
             last_state: The previous state value
             event: Flag to override whether the event is sent
+            serialized: The record as already serialized by save, if any
         """
 
         if event is None:
             event = new_record or (last_state != self.state)
         if event:
-            await self.emit_event(session, self.serialize())
+            await self.emit_event(session, serialized)
 
     async def delete_record(self, session: ProfileSession):
         """Remove the stored record.
@@ -408,12 +563,15 @@ class BaseRecord(BaseModel):
             if self.state:
                 self._previous_state = self.state
                 self.state = BaseRecord.STATE_DELETED
-                await self.emit_event(session, self.serialize())
+                await self.emit_event(session)
             await storage.delete_record(self.storage_record)
 
     async def emit_event(self, session: ProfileSession, payload: Any = None):
         """Emit an event.
 
+        The record is only serialized for a missing payload when some
+        subscriber is listening on the topic.
+
         Args:
             session: The profile session to use
             payload: The event payload
@@ -428,10 +586,24 @@ class BaseRecord(BaseModel):
             topic = f"{self.EVENT_NAMESPACE}::{self.RECORD_TOPIC}"
 
         if not payload:
+            event_bus = session.profile.inject_or(EventBus)
+            if not event_bus or not event_bus.has_subscribers(topic):
+                return
             payload = self.serialize()
 
         await session.emit_event(topic, payload)
 
+    @classmethod
+    def log_state_enabled(
+        cls, settings: BaseSettings = None, override: bool = False
+    ) -> bool:
+        """Check whether state changes are to be logged."""
+
+        return bool(
+            override
+            or (cls.LOG_STATE_FLAG and settings and settings.get(cls.LOG_STATE_FLAG))
+        )
+
     @classmethod
     def log_state(
         cls,
@@ -442,9 +614,7 @@ class BaseRecord(BaseModel):
     ):
         """Print a message with increased visibility (for testing)."""
 
-        if override or (
-            cls.LOG_STATE_FLAG and settings and settings.get(cls.LOG_STATE_FLAG)
-        ):
+        if cls.log_state_enabled(settings, override):
             out = msg + "\n"
             if params:
                 for k, v in params.items():
@@ -459,28 +629,71 @@ class BaseRecord(BaseModel):
             {(k[1:] if "~" in k else k): v for (k, v) in tags.items()} if tags else {}
         )
 
+    @classmethod
+    def push_down_post_filter(
+        cls, tag_filter: Optional[dict], post_filter: Optional[dict], alt: bool = False
+    ) -> Tuple[Optional[dict], Optional[dict]]:
+        """Move positive post-filter criteria on tagged values into the tag filter.
+
+        Equality (or, with `alt`, any-of) criteria on non-empty string values of
+        properties stored as tags are evaluated by the storage backend instead of
+        against every decoded record. Other criteria are left in place.
+
+        Args:
+            tag_filter: The tag filter to extend
+            post_filter: Value filter to apply matching positively
+            alt: set to match any value in post_filter
+
+        Returns:
+            A tuple of the extended tag filter and the residual post-filter
+
+        """
+        if not post_filter:
+            return tag_filter, post_filter
+
+        tag_map = cls.get_tag_map()
+        search_filter = dict(tag_filter or {})
+        residual = {}
+        for k, v in post_filter.items():
+            if k in tag_map and k not in search_filter:
+                if not alt and v and isinstance(v, str):
+                    search_filter[k] = v
+                    continue
+                if (
+                    alt
+                    and v
+                    and isinstance(v, (list, tuple, set))
+                    and all(alt_v and isinstance(alt_v, str) for alt_v in v)
+                ):
+                    search_filter[k] = {"$in": list(v)}
+                    continue
+            residual[k] = v
+
+        if len(residual) == len(post_filter):
+            return tag_filter, post_filter
+        return search_filter, residual
+
     @classmethod
     def prefix_tag_filter(cls, tag_filter: dict):
         """Prefix unencrypted tags used in the tag filter."""
 
-        ret = None
-        if tag_filter:
-            tag_map = cls.get_tag_map()
-            ret = {}
-            for k, v in tag_filter.items():
-                if k in ("$or", "$and") and isinstance(v, list):
-                    ret[k] = [cls.prefix_tag_filter(clause) for clause in v]
-                elif k == "$not" and isinstance(v, dict):
-                    ret[k] = cls.prefix_tag_filter(v)
-                else:
-                    ret[tag_map.get(k, k)] = v
-        return ret
+        if not tag_filter:
+            return None
+        tag_map = cls.get_tag_map()
+        if all(prop == tag for (prop, tag) in tag_map.items()):
+            return tag_filter  # no unencrypted tags, nothing to rename
+        return _prefix_tag_filter(tag_filter, tag_map)
 
     def __eq__(self, other: Any) -> bool:
         """Comparison between records."""
 
         if type(other) is type(self):
-            return self.value == other.value and self.tags == other.tags
+            # tags are generated once per side and compared before the values
+            tags = self.tags
+            other_tags = other.tags
+            if tags != other_tags:
+                return False
+            return self._value_for_tags(tags) == other._value_for_tags(other_tags)
         return False
 
     @classmethod
@@ -521,11 +734,7 @@ class BaseExchangeRecord(BaseRecord):
         """Comparison between records."""
 
         if type(other) is type(self):
-            return (
-                self.value == other.value
-                and self.tags == other.tags
-                and self.trace == other.trace
-            )
+            return self.trace == other.trace and super().__eq__(other)
         return False
 
 
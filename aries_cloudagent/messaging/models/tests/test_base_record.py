@@ -1,4 +1,5 @@
 import json
+import re
 
 from aries_cloudagent.tests import mock
 from unittest import IsolatedAsyncioTestCase
@@ -10,13 +11,14 @@ from ....core.in_memory import InMemoryProfile
 from ....storage.base import (
     BaseStorage,
     StorageDuplicateError,
+    StorageNotFoundError,
     StorageRecord,
 )
 from ....messaging.models.base import BaseModelError
 
 from ...util import time_now
 
-from ..base_record import BaseRecord, BaseRecordSchema
+from ..base_record import BaseRecord, BaseRecordSchema, match_post_filter
 
 
 class BaseRecordImpl(BaseRecord):
@@ -91,7 +93,9 @@ class TestBaseRecord(IsolatedAsyncioTestCase):
         record = BaseRecordImpl()
         with mock.patch.object(record, "post_save", mock.CoroutineMock()) as post_save:
             await record.save(session, reason="reason", event=True)
-            post_save.assert_called_once_with(session, True, None, True)
+            post_save.assert_called_once_with(
+                session, True, None, True, serialized=None
+            )
         mock_storage.add_record.assert_called_once()
 
     async def test_post_save_exist(self):
@@ -105,9 +109,31 @@ class TestBaseRecord(IsolatedAsyncioTestCase):
         record._id = "id"
         with mock.patch.object(record, "post_save", mock.CoroutineMock()) as post_save:
             await record.save(session, reason="reason", event=False)
-            post_save.assert_called_once_with(session, False, last_state, False)
+            post_save.assert_called_once_with(
+                session, False, last_state, False, serialized=None
+            )
         mock_storage.update_record.assert_called_once()
 
+    @mock.patch("builtins.print")
+    async def test_save_serialize_once(self, mock_print):
+        session = InMemoryProfile.test_session()
+        record = BaseRecordImpl()
+        with mock.patch.object(
+            record, "serialize", mock.MagicMock(return_value={"a": "1"})
+        ) as serialize, mock.patch.object(
+            record, "emit_event", mock.CoroutineMock()
+        ) as emit_event:
+            await record.save(session, event=True)
+            serialize.assert_not_called()
+            emit_event.assert_called_once_with(session, None)
+
+            serialize.reset_mock()
+            emit_event.reset_mock()
+            await record.save(session, log_override=True, event=True)
+            serialize.assert_called_once()
+            emit_event.assert_called_once_with(session, {"a": "1"})
+        mock_print.assert_called_once()
+
     async def test_cache(self):
         assert not await BaseRecordImpl.get_cached_key(None, None)
         await BaseRecordImpl.set_cached_key(None, None, None)
@@ -141,6 +167,19 @@ class TestBaseRecord(IsolatedAsyncioTestCase):
             )
         await records[0].delete_record(session)
 
+    async def test_retrieve_many_by_id(self):
+        session = InMemoryProfile.test_session()
+        records = [ARecordImpl(a="1", b=str(i), code="one") for i in range(3)]
+        record_ids = [await record.save(session) for record in records]
+
+        found = await ARecordImpl.retrieve_many_by_id(session, record_ids[::-1])
+        assert [record.b for record in found] == ["2", "1", "0"]
+        assert [record._id for record in found] == record_ids[::-1]
+        assert await ARecordImpl.retrieve_many_by_id(session, []) == []
+
+        with self.assertRaises(StorageNotFoundError):
+            await ARecordImpl.retrieve_many_by_id(session, [record_ids[0], "missing"])
+
     async def test_save_x(self):
         session = InMemoryProfile.test_session()
         rec = ARecordImpl(a="1", b="0", code="one")
@@ -156,6 +195,16 @@ class TestBaseRecord(IsolatedAsyncioTestCase):
         b_rec = BaseRecordImpl()
         assert a_rec != b_rec
 
+    async def test_eq(self):
+        a_rec = ARecordImpl(a="1", b="0", code="one")
+        same = ARecordImpl(a="1", b="0", code="one")
+        assert a_rec == same
+        assert a_rec != ARecordImpl(a="1", b="1", code="one")
+
+        with mock.patch.object(ARecordImpl, "_value_for_tags") as value_for_tags:
+            assert a_rec != ARecordImpl(a="1", b="0", code="two")
+            value_for_tags.assert_not_called()
+
     async def test_query(self):
         session = InMemoryProfile.test_session()
         mock_storage = mock.MagicMock(BaseStorage, autospec=True)
@@ -176,6 +225,29 @@ class TestBaseRecord(IsolatedAsyncioTestCase):
         assert result[0]._id == record_id
         assert result[0].value == record_value
 
+    async def test_query_batched(self):
+        session = InMemoryProfile.test_session()
+        mock_storage = mock.MagicMock(BaseStorage, autospec=True)
+        session.context.injector.bind_instance(BaseStorage, mock_storage)
+        mock_storage.find_all_records.return_value = [
+            StorageRecord(
+                ARecordImpl.RECORD_TYPE,
+                json.dumps({"a": "one", "b": str(i), "code": "red"}),
+                {"code": "red"},
+                f"record_{i}",
+            )
+            for i in range(5)
+        ]
+
+        with mock.patch.object(ARecordImpl, "QUERY_BATCH_SIZE", 2):
+            result = await ARecordImpl.query(session, post_filter_negative={"b": "3"})
+        assert [rec._id for rec in result] == [
+            "record_0",
+            "record_1",
+            "record_2",
+            "record_4",
+        ]
+
     async def test_query_x(self):
         session = InMemoryProfile.test_session()
         mock_storage = mock.MagicMock(BaseStorage, autospec=True)
@@ -254,6 +326,20 @@ class TestBaseRecord(IsolatedAsyncioTestCase):
         )
         assert not result
 
+    def test_match_post_filter(self):
+        record = {"a": "one", "b": ["x"], "c": ""}
+        assert match_post_filter(record, None)
+        assert match_post_filter(record, {"a": "one"})
+        assert not match_post_filter(record, {"a": "one"}, positive=False)
+        assert match_post_filter(record, {"a": "two"}, positive=False)
+        assert match_post_filter(record, {"a": ["one", "two"]}, alt=True)
+        assert match_post_filter(record, {"a": ("one", {})}, alt=True)
+        assert not match_post_filter(record, {"c": ["", "two"]}, alt=True)
+        assert match_post_filter(record, {"b": ["x"]}, positive=False, alt=True)
+        assert not match_post_filter(
+            record, {"a": ["one", "two"]}, positive=False, alt=True
+        )
+
     @mock.patch("builtins.print")
     def test_log_state(self, mock_print):
         test_param = "test.log"
@@ -307,6 +393,90 @@ class TestBaseRecord(IsolatedAsyncioTestCase):
             (session.profile, Event("acapy::record::topic::test_state", payload))
         ]
 
+    async def test_emit_event_no_subscribers(self):
+        session = InMemoryProfile.test_session()
+        event_bus = EventBus()
+        session.profile.context.injector.bind_instance(EventBus, event_bus)
+        record = BaseRecordImpl()
+        record.RECORD_TOPIC = "topic"
+        with mock.patch.object(record, "serialize", mock.MagicMock()) as serialize:
+            await record.emit_event(session)
+            serialize.assert_not_called()
+
+            processor = mock.CoroutineMock()
+            event_bus.subscribe(re.compile("^acapy::record::topic$"), processor)
+            serialize.return_value = {"a": "1"}
+            await record.emit_event(session)
+            serialize.assert_called_once()
+            processor.assert_awaited_once()
+
+    def test_get_tag_map_cached(self):
+        tag_map = UnencTestImpl.get_tag_map()
+        assert tag_map == {"a": "~a", "b": "~b", "c": "c"}
+        assert UnencTestImpl.get_tag_map() is tag_map
+        assert ARecordImpl.get_tag_map() == {"code": "code"}
+
+        with mock.patch.object(UnencTestImpl, "TAG_NAMES", {"~d"}):
+            assert UnencTestImpl.get_tag_map() == {"d": "~d"}
+        assert UnencTestImpl.get_tag_map() == tag_map
+
+    def test_record_tags(self):
+        assert BaseRecordImpl().record_tags == {}
+        assert ARecordImpl(a="1", b="2").record_tags == {}
+        assert ARecordImpl(a="1", b="2", code="red").record_tags == {"code": "red"}
+
+        with mock.patch.object(UnencTestImpl, "RECORD_TYPE", "unenc"):
+            record = UnencTestImpl()
+        record.a, record.b, record.c = "one", None, "three"
+        assert record.record_tags == {"~a": "one", "c": "three"}
+        with mock.patch.object(UnencTestImpl, "TAG_NAMES", {"~b"}):
+            assert record.record_tags == {}
+        assert record.record_tags == {"~a": "one", "c": "three"}
+
+    def test_push_down_post_filter(self):
+        assert ARecordImpl.push_down_post_filter({"x": "y"}, None) == ({"x": "y"}, None)
+        assert ARecordImpl.push_down_post_filter(None, {"a": "one"}) == (
+            None,
+            {"a": "one"},
+        )
+        assert ARecordImpl.push_down_post_filter(None, {"a": "one", "code": "red"}) == (
+            {"code": "red"},
+            {"a": "one"},
+        )
+        assert ARecordImpl.push_down_post_filter({"code": "red"}, {"code": "blue"}) == (
+            {"code": "red"},
+            {"code": "blue"},
+        )
+        assert ARecordImpl.push_down_post_filter(
+            {"x": "y"}, {"code": ["red", "blue"]}, alt=True
+        ) == ({"x": "y", "code": {"$in": ["red", "blue"]}}, {})
+        assert ARecordImpl.push_down_post_filter(
+            None, {"code": ["red", ""]}, alt=True
+        ) == (None, {"code": ["red", ""]})
+        assert UnencTestImpl.push_down_post_filter(None, {"a": "x"}) == (
+            {"a": "x"},
+            {},
+        )
+
+    async def test_query_push_down_post_filter(self):
+        session = InMemoryProfile.test_session()
+        records = [
+            ARecordImpl(a="1", b=str(i), code=code)
+            for i, code in enumerate(("red", "blue", "green"))
+        ]
+        for record in records:
+            await record.save(session)
+
+        result = await ARecordImpl.query(
+            session, post_filter_positive={"code": ["red", "green"]}, alt=True
+        )
+        assert sorted(rec.b for rec in result) == ["0", "2"]
+
+        result = await ARecordImpl.query(
+            session, post_filter_positive={"a": "1", "code": "blue"}
+        )
+        assert [rec.b for rec in result] == ["1"]
+
     async def test_tag_prefix(self):
         tags = {"~x": "a", "y": "b"}
         assert UnencTestImpl.strip_tag_prefix(tags) == {"x": "a", "y": "b"}
@@ -323,3 +493,7 @@ class TestBaseRecord(IsolatedAsyncioTestCase):
         assert UnencTestImpl.prefix_tag_filter(tags) == {
             "$or": [{"~a": "x"}, {"c": "z"}]
         }
+
+        tags = {"$or": [{"code": "x"}, {"code": "y"}]}
+        assert ARecordImpl.prefix_tag_filter(tags) is tags
+        assert ARecordImpl.prefix_tag_filter({}) is None
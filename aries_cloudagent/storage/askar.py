@@ -177,6 +177,8 @@ class AskarStorage(BaseStorage):
     ):
         """Retrieve all records matching a particular type filter and tag query."""
         for_update = bool(options and options.get("forUpdate"))
+        # tags are decoded per row on access, skip them when not wanted
+        retrieve_tags = not options or options.get("retrieveTags", True)
         results = []
         for row in await self._session.handle.fetch_all(
             type_filter, tag_query, for_update=for_update
@@ -186,7 +188,7 @@ class AskarStorage(BaseStorage):
                     type=row.category,
                     id=row.name,
                     value=None if row.value is None else row.value.decode("utf-8"),
-                    tags=row.tags,
+                    tags=row.tags if retrieve_tags else None,
                 )
             )
         return results
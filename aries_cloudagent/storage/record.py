@@ -3,7 +3,7 @@
 from collections import namedtuple
 from typing import Optional
 
-from uuid_utils import uuid4
+from uuid_utils import uuid7
 
 
 class StorageRecord(namedtuple("StorageRecord", "type value tags id")):
@@ -16,7 +16,7 @@ class StorageRecord(namedtuple("StorageRecord", "type value tags id")):
     ):
         """Initialize some defaults on record."""
         if not id:
-            id = uuid4().hex
+            id = uuid7().hex
         if not tags:
             tags = {}
         return super(cls, StorageRecord).__new__(cls, type, value, tags, id)
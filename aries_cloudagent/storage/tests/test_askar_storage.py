@@ -209,6 +209,19 @@ class TestAskarStorage(test_in_memory_storage.TestInMemoryStorage):
                 with pytest.raises(test_module.StorageError):
                     await storage.delete_record(rec)
 
+    @pytest.mark.asyncio
+    async def test_find_all_skip_tags(self, store, record_factory):
+        record = record_factory()
+        await store.add_record(record)
+
+        rows = await store.find_all_records(
+            record.type, {}, options={"retrieveTags": False}
+        )
+        assert len(rows) == 1
+        assert rows[0].id == record.id
+        assert rows[0].value == record.value
+        assert rows[0].tags == {}
+
     @pytest.mark.skip
     @pytest.mark.asyncio
     async def test_storage_search_x(self):
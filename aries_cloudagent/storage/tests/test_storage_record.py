@@ -11,3 +11,10 @@ class TestStorageRecord:
         assert record.value == record_value
         assert record.id and isinstance(record.id, str)
         assert record.tags == {}
+
+    def test_default_ids_time_ordered(self):
+        ids = [StorageRecord("TYPE", "VALUE").id for _ in range(10)]
+        assert all(len(record_id) == 32 for record_id in ids)
+        assert all(record_id[12] == "7" for record_id in ids)
+        stamps = [record_id[:12] for record_id in ids]
+        assert stamps == sorted(stamps)
@@ -0,0 +1,39 @@
+"""JSON encoding helpers, using orjson when it is available."""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_dumps(value: Any) -> str:
+    """Serialize a value to a JSON string.
+
+    Values orjson cannot encode, such as integers beyond 64 bits, are passed to
+    the standard library encoder instead. NaN and infinite floats are not valid
+    JSON; orjson writes them as null rather than as the NaN and Infinity
+    literals of the standard library encoder.
+    """
+    if orjson:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(value)
+
+
+def json_loads(value: Union[str, bytes]) -> Any:
+    """Deserialize a JSON string.
+
+    Documents orjson rejects, such as those containing NaN, are passed to the
+    standard library decoder instead.
+    """
+    if orjson:
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(value)
@@ -0,0 +1,30 @@
+import json
+import math
+from unittest import TestCase, mock
+
+from .. import json_util as test_module
+from ..json_util import json_dumps, json_loads
+
+
+class TestJsonUtil(TestCase):
+    def test_round_trip(self):
+        for value in (
+            {"a": "1", "b": [1, 2.5, None, True]},
+            {1: "int key"},
+            {"big": 2**80},
+            {"x": None, "f": 1.5, 2.5: [None, -0.0]},
+        ):
+            assert json_loads(json_dumps(value)) == json.loads(json.dumps(value))
+            with mock.patch.object(test_module, "orjson", None):
+                assert json_loads(json_dumps(value)) == json.loads(json.dumps(value))
+        assert math.isnan(json_loads('{"x": NaN}')["x"])
+        assert json_loads(b'{"a": 1}') == {"a": 1}
+
+    def test_dumps_non_finite(self):
+        value = {"x": float("nan"), "a": [None, {"b": (1, float("-inf"))}]}
+        assert json_loads(json_dumps(value)) == {
+            "x": None,
+            "a": [None, {"b": [1, None]}],
+        }
+        with mock.patch.object(test_module, "orjson", None):
+            assert json_dumps(value) == json.dumps(value)